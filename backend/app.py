@@ -1,5 +1,8 @@
 import os
+import re
 import json
+import time
+import threading
 import faiss
 import numpy as np
 import logging
@@ -10,11 +13,16 @@ from flask import Flask, request, jsonify, send_from_directory
 from flask_cors import CORS
 from dotenv import load_dotenv
 from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from collections import Counter
 
 # local imports
 from embeddings_indexer import load_index_and_meta
-from groq_client import groq_generate_async
-from sentence_transformers import SentenceTransformer
+from cutoff_table import load_cutoff_table, detect_category, category_matches
+from intent_router import IntentRouter
+from embedding_cache import cached_encode
+from encoder_backend import load_encoder
+from groq_client import groq_generate_async, GroqError, CircuitOpenError, RateLimitWaitError, breaker
 
 # ============ Setup ============
 load_dotenv()
@@ -50,28 +58,23 @@ except Exception as e:
     raise RuntimeError(f"Failed to load FAISS index: {e}")
 
 # Shared embedding model
-shared_model = SentenceTransformer("all-MiniLM-L6-v2")
+SHARED_MODEL_NAME = "all-MiniLM-L6-v2"
+shared_model = load_encoder(SHARED_MODEL_NAME)
 
 # ============ Build JSON embeddings ============
-qa_embeddings = shared_model.encode(questions, convert_to_numpy=True).astype("float32")
+qa_embeddings = cached_encode(shared_model, SHARED_MODEL_NAME, questions)
 dim = qa_embeddings.shape[1]
 
 faiss.normalize_L2(qa_embeddings)
 json_index = faiss.IndexFlatIP(dim)
 json_index.add(qa_embeddings)
 
-def search_json_embeddings(query: str, top_k: int = 1, threshold: float = 0.75):
-    """Search predefined JSON Q&A using semantic similarity."""
+@lru_cache(maxsize=256)
+def shared_query_embedding(query: str) -> np.ndarray:
+    """Normalized shared-model query embedding, computed once per query for routing and search."""
     q_emb = shared_model.encode([query], convert_to_numpy=True).astype("float32")
     faiss.normalize_L2(q_emb)
-    D, I = json_index.search(q_emb, top_k)
-
-    best_score = float(D[0][0])
-    best_idx = I[0][0]
-
-    if best_idx >= 0 and best_score >= threshold:
-        return answers[best_idx]
-    return None
+    return q_emb
 
 # ============ Load Cutoff FAISS ============
 CUTOFF_INDEX_FILE = DATA_DIR / "cutoff_index.faiss"
@@ -87,16 +90,33 @@ else:
         cutoff_documents = json.load(f)
     print(f"Cutoff FAISS index loaded with {len(cutoff_documents)} entries")
 
-def search_cutoff_embeddings(query: str, top_k: int = 10, threshold: float = 0.3):
+# Columnar rank/percentile arrays for eligibility/range queries (built by cet_marks.py)
+CUTOFF_TABLE_FILE = DATA_DIR / "cutoff_table.npz"
+cutoff_table = load_cutoff_table(CUTOFF_TABLE_FILE)
+if cutoff_table is not None:
+    print(f"Cutoff table loaded with {len(cutoff_table)} rows")
+
+# ============ Intent Router ============
+router = IntentRouter(
+    lambda texts: shared_model.encode(texts, convert_to_numpy=True),
+    qa_index=json_index,
+    cutoff_enabled=cutoff_index is not None or cutoff_table is not None,
+)
+
+# Routes decided by embedding alone need a closer cutoff match before we answer with a table
+CUTOFF_THRESHOLD = 0.3
+CUTOFF_STRICT_THRESHOLD = 0.5
+
+def search_cutoff_embeddings(query: str, top_k: int = 10, threshold: float = CUTOFF_THRESHOLD):
     """Search cutoff FAISS index and return all categories for the most relevant branch.
        If category is explicitly mentioned, filter for that category only.
        Output is formatted as a Markdown table for clean UI display.
+       Returns None when nothing scores above `threshold`, so the caller can fall through.
     """
     if not cutoff_index:
-        return ""
+        return None
 
-    q_emb = shared_model.encode([query], convert_to_numpy=True).astype("float32")
-    faiss.normalize_L2(q_emb)
+    q_emb = shared_query_embedding(query)
     D, I = cutoff_index.search(q_emb, top_k)
 
     results = []
@@ -106,15 +126,21 @@ def search_cutoff_embeddings(query: str, top_k: int = 10, threshold: float = 0.3
         results.append(cutoff_documents[idx])
 
     if not results:
-        return "No cutoff data found."
+        return None
 
     # Extract branch and category keywords from user query
-    query_lower = query.lower()
-    categories = ["open", "obc", "sc", "st", "ews", "nt", "sebc", "pwd", "def", "orphan", "tfws"]
-    target_category = next((c for c in categories if c in query_lower), None)
+    target_category = detect_category(query.lower())
 
     # --- Pick top branch ---
     top_branch = results[0].split(", ")[0].split(": ")[1]
+    return render_branch_table(top_branch, target_category)
+
+
+@lru_cache(maxsize=512)
+def render_branch_table(top_branch: str, target_category: str | None) -> str | None:
+    """Markdown cutoff table for one branch (optionally one category), cached per pair; None if empty."""
+    if cutoff_table is not None:
+        return cutoff_table.branch_table(top_branch, target_category)
 
     grouped = []
     for r in cutoff_documents:   # iterate over all docs to fetch full table
@@ -126,13 +152,13 @@ def search_cutoff_embeddings(query: str, top_k: int = 10, threshold: float = 0.3
 
         if branch == top_branch:
             if target_category:
-                if target_category in category.lower():
+                if category_matches(category, target_category):
                     grouped.append((category, cutoff_rank, percentile))
             else:
                 grouped.append((category, cutoff_rank, percentile))
 
     if not grouped:
-        return f"No cutoff data found for {top_branch} ({target_category or 'all categories'})."
+        return None
 
     # --- Build Markdown Table ---
     md_table = f"### Cutoff for {top_branch}\n\n"
@@ -162,6 +188,8 @@ def retrieve(query: str, top_k: int = 3):
         results.append({
             "id": int(meta.get("id", int(idx))),
             "text": meta["text"],
+            "section": meta.get("section"),
+            "url": meta.get("url"),
             "score": float(score)
         })
     return results
@@ -206,7 +234,10 @@ def build_prompt(question, retrieved_docs, history):
             a_text = truncate_text(h.get("a", ""), MAX_HISTORY_CHARS // 2)
             hist_text += f"Q: {q_text}\nA: {a_text}\n"
 
-    sources_text = "\n\n".join([truncate_text(d["text"], MAX_DOC_CHARS) for d in retrieved_docs[:3]])
+    sources_text = "\n\n".join([
+        (f"[{d['section']}] " if d.get("section") else "") + truncate_text(d["text"], MAX_DOC_CHARS)
+        for d in retrieved_docs[:3]
+    ])
 
     user_prompt = (
         f"{hist_text}\nQuestion: {truncate_text(question, MAX_DOC_CHARS)}\n\n"
@@ -219,6 +250,65 @@ def build_prompt(question, retrieved_docs, history):
 
     return system, user_prompt
 
+# ============ Speculative Stages ============
+# When enabled, RAG retrieval + prompt building start on a worker thread as soon as a
+# query arrives, overlapping with routing and the cutoff/QA stages. Speculation is
+# only started when cheap pre-checks (no cutoff keyword, no exact Q&A question) suggest
+# the query will reach RAG, because a started job cannot be cancelled and its mpnet
+# encode competes with the router's encode for the same CPU cores.
+SPECULATIVE_STAGES = os.getenv("SPECULATIVE_STAGES", "false").lower() == "true"
+STAGE_WORKERS = int(os.getenv("STAGE_WORKERS", "4"))
+stage_pool = ThreadPoolExecutor(max_workers=STAGE_WORKERS, thread_name_prefix="stage") if SPECULATIVE_STAGES else None
+
+# submitted / used / wasted / skipped, plus time the RAG path did not have to wait
+SPECULATION_KEYS = ("submitted", "used", "wasted", "skipped", "saved_ms")
+SPECULATION = Counter(dict.fromkeys(SPECULATION_KEYS, 0))
+_speculation_lock = threading.Lock()
+
+def count_speculation(key: str, n: int = 1):
+    with _speculation_lock:
+        SPECULATION[key] += n
+
+def speculation_stats() -> dict:
+    with _speculation_lock:
+        return {key: SPECULATION[key] for key in SPECULATION_KEYS}
+
+def normalize_question(text: str) -> str:
+    return re.sub(r"\s+", " ", re.sub(r"[^a-z0-9 ]", " ", text.lower())).strip()
+
+QA_EXACT = {normalize_question(qn) for qn in questions}
+
+def should_speculate(q_lower: str) -> bool:
+    """Cheap pre-check (no encode) that the query is likely to end up on the RAG path."""
+    if router.cutoff_enabled and any(router.keyword_hits(q_lower)):
+        return False
+    return normalize_question(q_lower) not in QA_EXACT
+
+def prepare_rag(question, history):
+    """Retrieve context and build the Groq prompt; returns (retrieved, system, user_prompt, seconds)."""
+    start = time.perf_counter()
+    retrieved = retrieve(question, top_k=3)
+    system, user_prompt = build_prompt(question, retrieved, history)
+    return retrieved, system, user_prompt, time.perf_counter() - start
+
+def discard(future):
+    if future is None:
+        return
+    count_speculation("wasted")
+    if not future.cancel():
+        logger.debug("Speculative RAG already running, result will be discarded")
+
+def collect_rag(future, question, history):
+    """Result of the speculative job if one was started, else run RAG prep inline."""
+    if future is None:
+        return prepare_rag(question, history)[:3]
+    start = time.perf_counter()
+    retrieved, system, user_prompt, took = future.result()
+    waited = time.perf_counter() - start
+    count_speculation("used")
+    count_speculation("saved_ms", int(max(took - waited, 0.0) * 1000))
+    return retrieved, system, user_prompt
+
 # ============ API ============
 @app.route("/api/query", methods=["POST"])
 def api_query():
@@ -238,38 +328,68 @@ def api_query():
         gc.collect()
         return jsonify({"answer": "History cleared.", "retrieved": [], "history": []})
 
-    # Step 0: Admission/Cutoff priority search
-    admission_keywords = {"cutoff", "cut off" , "rank", "cet", "marks"}
-    if any(word in q_lower for word in admission_keywords):
-        cutoff_answer = search_cutoff_embeddings(q)  # Markdown string
+    hist = HISTORY.get(session_id, [])
+    # Start RAG prep in the background only when the query looks RAG-bound
+    rag_future = None
+    if stage_pool:
+        if should_speculate(q_lower):
+            rag_future = stage_pool.submit(prepare_rag, q, list(hist))
+            count_speculation("submitted")
+        else:
+            count_speculation("skipped")
+
+    # Step 0: Route to a single stage (cutoff / qa / rag) from one query embedding
+    route = router.route(q, shared_query_embedding(q))
+    route_info = {"name": route.name, "confidence": round(route.confidence, 3), "reason": route.reason}
+    logger.info("Route %s (%.2f, %s): %s", route.name, route.confidence, route.reason, q[:80])
+
+    # Step 1: Admission/Cutoff search
+    if route.name == "cutoff":
+        # "What can I get with 95 percentile" -> vectorized eligibility table, else branch lookup
+        cutoff_answer = cutoff_table.answer(q) if cutoff_table is not None else None
+        if not cutoff_answer:
+            threshold = CUTOFF_THRESHOLD if route.reason.startswith("keyword") else CUTOFF_STRICT_THRESHOLD
+            cutoff_answer = search_cutoff_embeddings(q, threshold=threshold)  # Markdown string
         if cutoff_answer:
-            hist = HISTORY.get(session_id, [])
+            discard(rag_future)
             hist.append({"q": q, "a": cutoff_answer})
             HISTORY[session_id] = hist[-10:]
-            return jsonify({"answer": cutoff_answer, "retrieved": [], "history": HISTORY[session_id]})
-        # else fallback continues...
-
-    # Step 1: Semantic JSON lookup
-    json_answer = search_json_embeddings(q)
-    if json_answer:
-        hist = HISTORY.get(session_id, [])
+            return jsonify({"answer": cutoff_answer, "retrieved": [], "history": HISTORY[session_id],
+                            "route": route_info})
+        # Cutoff miss: fall through to the Q&A lookup, then RAG
+        route = router.fallback(shared_query_embedding(q))
+        route_info = {"name": route.name, "confidence": round(route.confidence, 3), "reason": route.reason}
+
+    # Step 1b: Semantic JSON lookup (router already found the matching Q&A row)
+    if route.name == "qa":
+        json_answer = answers[route.qa_index]
+        discard(rag_future)
         hist.append({"q": q, "a": json_answer})
         HISTORY[session_id] = hist[-10:]
-        return jsonify({"answer": json_answer, "retrieved": [], "history": HISTORY[session_id]})
+        return jsonify({"answer": json_answer, "retrieved": [], "history": HISTORY[session_id],
+                        "route": route_info})
 
-    # Step 2: General FAISS + Groq
+    # Step 2: General FAISS + Groq (prompt may already be prepared speculatively)
     try:
-        retrieved = retrieve(q, top_k=3)
+        retrieved, system, user_prompt = collect_rag(rag_future, q, hist)
     except Exception as e:
         logger.exception("Retrieval failed: %s", e)
         return jsonify({"error": f"Retrieval failed: {str(e)}"}), 500
 
-    hist = HISTORY.get(session_id, [])
-    system, user_prompt = build_prompt(q, retrieved, hist)
-
     try:
         logger.info("Calling Groq: %s", q[:80])
         answer = run_async(groq_generate_async(system, user_prompt, max_tokens=300, temperature=0.1))
+    except GroqError as e:
+        if isinstance(e, CircuitOpenError):
+            logger.warning("Groq circuit open, answering from top retrieved chunk")
+        elif isinstance(e, RateLimitWaitError):
+            logger.warning("Groq client rate limit reached, answering from top retrieved chunk")
+        else:
+            logger.error("Groq API error: %s", e)
+        if not retrieved:
+            return jsonify({"error": "Groq API error"}), 502
+        # Degrade to the best retrieved passage rather than failing the request
+        answer = truncate_text(retrieved[0]["text"], MAX_DOC_CHARS)
     except Exception as e:
         logger.error("Groq API error: %s", e)
         return jsonify({"error": "Groq API error"}), 502
@@ -277,7 +397,8 @@ def api_query():
     hist.append({"q": q, "a": answer})
     HISTORY[session_id] = hist[-10:]
 
-    return jsonify({"answer": answer, "retrieved": retrieved, "history": HISTORY[session_id]})
+    return jsonify({"answer": answer, "retrieved": retrieved, "history": HISTORY[session_id],
+                    "route": route_info})
 
 @app.route("/api/history", methods=["GET"])
 def api_history():
@@ -290,6 +411,9 @@ def api_health():
         "status": "ok",
         "faiss_loaded": faiss_index is not None,
         "cutoff_loaded": cutoff_index is not None,
+        "groq_circuit": breaker.state,
+        "routes": router.stats(),
+        "speculation": speculation_stats() if stage_pool else None,
         "qa_count": len(qa_data)
     })
 
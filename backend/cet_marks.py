@@ -2,6 +2,7 @@ import json
 import faiss
 import numpy as np
 from sentence_transformers import SentenceTransformer
+from embedding_cache import cached_encode
 import re
 
 # ---------- Normalization helper ----------
@@ -32,10 +33,11 @@ for record in data:
     documents.append(normalize_text(text))
 
 # ---------- Load embedding model ----------
-model = SentenceTransformer("all-MiniLM-L6-v2")
+MODEL_NAME = "all-MiniLM-L6-v2"
+model = SentenceTransformer(MODEL_NAME)
 
-# ---------- Create embeddings ----------
-embeddings = model.encode(documents, convert_to_numpy=True).astype("float32")
+# ---------- Create embeddings (reuses cached vectors for unchanged rows) ----------
+embeddings = cached_encode(model, MODEL_NAME, documents)
 
 # Normalize embeddings for cosine similarity
 faiss.normalize_L2(embeddings)
@@ -52,9 +54,40 @@ faiss.write_index(index, "data/cutoff_index.faiss")
 with open("data/cutoff_documents.json", "w", encoding="utf-8") as f:
     json.dump(documents, f, indent=2, ensure_ascii=False)
 
+# ---------- Save columnar arrays for vectorized rank/percentile queries ----------
+def to_float(value) -> float:
+    """Parse rank/percentile values like '12345', '95.67', '95.67%' (NaN if missing)."""
+    try:
+        return float(str(value).strip().rstrip("%").replace(",", ""))
+    except ValueError:
+        return float("nan")
+
+def encode(values):
+    """Map strings to integer codes; returns (codes, vocabulary in first-seen order)."""
+    vocab = {}
+    codes = np.array([vocab.setdefault(v, len(vocab)) for v in values], dtype=np.int32)
+    return codes, list(vocab)
+
+branch_code, branches = encode([str(r["Branch"]).strip() for r in data])
+category_code, categories = encode([str(r["Category"]).strip() for r in data])
+level_code, levels = encode([str(r["Category Level"]).strip() for r in data])
+
+np.savez(
+    "data/cutoff_table.npz",
+    rank=np.array([to_float(r["Cutoff Rank"]) for r in data], dtype=np.float64),
+    percentile=np.array([to_float(r["Cutoff Percentile"]) for r in data], dtype=np.float64),
+    branch_code=branch_code,
+    category_code=category_code,
+    level_code=level_code,
+    branches=np.array(branches, dtype=str),
+    categories=np.array(categories, dtype=str),
+    levels=np.array(levels, dtype=str),
+)
+
 print("Files generated:")
 print(" - cutoff_index.faiss (FAISS vector index)")
 print(" - cutoff_documents.json (text data)")
+print(" - cutoff_table.npz (rank/percentile arrays with branch/category codes)")
 
 # ---------- TEST SEARCH ----------
 index_loaded = faiss.read_index("data/cutoff_index.faiss")
@@ -0,0 +1,270 @@
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+# Category specs are "<base>" or "<base>:<quota>", e.g. "obc", "open:ladies", "sc:pwd".
+CATEGORIES = ["open", "obc", "sebc", "sc", "st", "vj", "nt", "ews", "tfws", "orphan"]
+QUOTAS = {"ladies": "ladies", "girls": "ladies", "girl": "ladies", "female": "ladies", "women": "ladies",
+          "pwd": "pwd", "ph": "pwd", "def": "def", "defence": "def", "defense": "def"}
+DEFAULT_CATEGORY = "open"
+_CATEGORY_RE = re.compile(r"\b(" + "|".join(CATEGORIES) + r")\b")
+_QUOTA_RE = re.compile(r"\b(" + "|".join(QUOTAS) + r")\b")
+
+# MHT-CET seat codes: optional PWD/DEF prefix, G(eneral)/L(adies), category, H/O/S seat level,
+# e.g. GOPENS, LOBCH, PWDOPENS, DEFSCS, GNT1S. TFWS/EWS/ORPHAN stand alone.
+_CODE_RE = re.compile(r"^(PWD|DEF)?([GL])?(OPEN|OBC|SEBC|SC|ST|VJ|NT\d?|EWS)([HOS])?$")
+
+_NUM = r"(\d+(?:\.\d+)?)"
+_PERCENTILE_WORD = r"(?:percentile|%ile|pr\b|%)"
+_RANGE_RE = re.compile(
+    rf"(?:between|from)\s+{_NUM}\s*(?:and|to|-)\s*{_NUM}\s*(percentile|%ile|%|rank)?"
+)
+_PERCENTILE_RE = re.compile(
+    rf"{_NUM}\s*{_PERCENTILE_WORD}|(?:percentile|%ile)\s*(?:of|is|=|:)?\s*{_NUM}"
+)
+_RANK_RE = re.compile(r"(?:rank)\s*(?:of|is|=|:)?\s*(\d+)|(\d+)\s*(?:st|nd|rd|th)?\s*rank")
+_YEAR_RE = re.compile(r"(?:19|20)\d\d")
+
+MAX_ROWS = 40
+
+
+def detect_category(query_lower: str) -> Optional[str]:
+    """Category spec mentioned in the query (whole words only), or None if there is none."""
+    m = _CATEGORY_RE.search(query_lower)
+    q = _QUOTA_RE.search(query_lower)
+    if not m and not q:
+        return None
+    base = m.group(1) if m else DEFAULT_CATEGORY
+    return f"{base}:{QUOTAS[q.group(1)]}" if q else base
+
+
+@lru_cache(maxsize=1024)
+def eligible_categories(spec: str) -> tuple:
+    """Specs whose seats a candidate of `spec` can take: reserved categories also compete for OPEN seats."""
+    base, _, quota = spec.partition(":")
+    if base == DEFAULT_CATEGORY:
+        return (spec,)
+    return (spec, f"{DEFAULT_CATEGORY}:{quota}" if quota else DEFAULT_CATEGORY)
+
+
+def _number(m: re.Match) -> Optional[str]:
+    """First captured number of a match, unless it is a year ("cutoff rank 2023")."""
+    value = next((g for g in m.groups() if g is not None), None)
+    return None if value is None or _YEAR_RE.fullmatch(value) else value
+
+
+def _name_pattern(name: str) -> re.Pattern:
+    """Whole-word, case-insensitive pattern for a name, tolerant of punctuation/spacing differences."""
+    words = re.findall(r"\w+", name.lower())
+    return re.compile(r"(?<!\w)" + r"\W+".join(map(re.escape, words)) + r"(?!\w)")
+
+
+def parse_category_code(name: str) -> tuple:
+    """(base, quota) for a seat category name; quota is None for general seats."""
+    code = re.sub(r"[\s_-]+", "", name.upper())
+    m = _CODE_RE.match(code)
+    if not m:
+        return code.lower(), None
+    prefix, gender, base, _ = m.groups()
+    quota = prefix.lower() if prefix else ("ladies" if gender == "L" else None)
+    return base.lower(), quota
+
+
+def category_matches(name: str, spec: str) -> bool:
+    """Exact match of a seat category against a spec: 'obc' selects GOBCS/GOBCH, not LOBCS or PWDOBCS."""
+    base, quota = parse_category_code(name)
+    want_base, _, want_quota = spec.partition(":")
+    if base != want_base and not (want_base == "nt" and base.startswith("nt")):
+        return False
+    return quota == (want_quota or None)
+
+
+def parse_cutoff_query(query: str) -> Optional[dict]:
+    """Extract a structured "what can I get" query: percentile/rank value or range + category.
+
+    Returns None when the query carries no usable number.
+    """
+    q = query.lower()
+    parsed = {"category": detect_category(q)}
+
+    m = _RANGE_RE.search(q)
+    if m:
+        lo, hi = sorted((float(m.group(1)), float(m.group(2))))
+        if m.group(3) == "rank" or hi > 100:
+            parsed.update(min_rank=lo, max_rank=hi)
+        else:
+            parsed.update(min_percentile=lo, max_percentile=hi)
+        return parsed
+
+    for m in _PERCENTILE_RE.finditer(q):
+        value = _number(m)
+        if value is not None and 0 <= float(value) <= 100:
+            parsed["percentile"] = float(value)
+            return parsed
+
+    for m in _RANK_RE.finditer(q):
+        value = _number(m)
+        if value is not None:
+            parsed["rank"] = float(value)
+            return parsed
+
+    return None
+
+
+class CutoffTable:
+    """Columnar cutoff data (written by cet_marks.py) with vectorized filters.
+
+    Ranks and percentiles are float arrays (NaN when missing); branch, category
+    and category level are integer codes into the matching name arrays.
+    """
+
+    def __init__(self, path: Path):
+        with np.load(path) as z:
+            self.rank = z["rank"]
+            self.percentile = z["percentile"]
+            self.branch_code = z["branch_code"]
+            self.category_code = z["category_code"]
+            self.level_code = z["level_code"]
+            self.branches = [str(b) for b in z["branches"]]
+            self.categories = [str(c) for c in z["categories"]]
+            self.levels = [str(lv) for lv in z["levels"]]
+
+        self._branch_lookup = {b.lower().strip(): i for i, b in enumerate(self.branches)}
+        # Longest names first so "computer engineering" is not shadowed by a shorter branch
+        self._branch_patterns = [(_name_pattern(b), b) for b in sorted(self.branches, key=len, reverse=True)
+                                 if re.search(r"\w", b)]
+        self.eligibility_table = lru_cache(maxsize=1024)(self._eligibility_table)
+
+    def __len__(self):
+        return len(self.rank)
+
+    def detect_branch(self, query_lower: str) -> Optional[str]:
+        """Branch named in the query (whole words, longest name wins), or None."""
+        for pattern, branch in self._branch_patterns:
+            if pattern.search(query_lower):
+                return branch
+        return None
+
+    # ---------- Vectorized selection ----------
+    def category_mask(self, category) -> np.ndarray:
+        """Rows whose seat category matches the spec or any of a tuple of specs; all rows if None."""
+        if not category:
+            return np.ones(len(self), dtype=bool)
+        specs = (category,) if isinstance(category, str) else category
+        codes = [i for i, c in enumerate(self.categories) if any(category_matches(c, s) for s in specs)]
+        return np.isin(self.category_code, codes)
+
+    def select(self, category=None, branch: Optional[str] = None,
+               min_percentile: Optional[float] = None, max_percentile: Optional[float] = None,
+               min_rank: Optional[float] = None, max_rank: Optional[float] = None,
+               sort_by: str = "percentile", descending: bool = True) -> np.ndarray:
+        """Row indices matching all filters, sorted by `sort_by` ('percentile' or 'rank')."""
+        mask = self.category_mask(category)
+        if branch is not None:
+            code = self._branch_lookup.get(branch.lower().strip())
+            if code is None:
+                return np.empty(0, dtype=np.int64)
+            mask &= self.branch_code == code
+        if min_percentile is not None:
+            mask &= self.percentile >= min_percentile
+        if max_percentile is not None:
+            mask &= self.percentile <= max_percentile
+        if min_rank is not None:
+            mask &= self.rank >= min_rank
+        if max_rank is not None:
+            mask &= self.rank <= max_rank
+
+        idx = np.flatnonzero(mask)
+        key = self.percentile[idx] if sort_by == "percentile" else self.rank[idx]
+        order = np.argsort(-key if descending else key, kind="stable")
+        return idx[order]
+
+    def eligible(self, percentile: Optional[float] = None, rank: Optional[float] = None,
+                 category: str = DEFAULT_CATEGORY, branch: Optional[str] = None) -> np.ndarray:
+        """Rows a student can get (own category seats plus OPEN seats): cutoff percentile <= theirs,
+        or cutoff rank >= theirs."""
+        categories = eligible_categories(category)
+        if percentile is not None:
+            return self.select(category=categories, branch=branch, max_percentile=percentile)
+        if rank is not None:
+            return self.select(category=categories, branch=branch, min_rank=rank,
+                               sort_by="rank", descending=False)
+        return self.select(category=categories, branch=branch)
+
+    # ---------- Markdown rendering ----------
+    def _rows(self, idx: np.ndarray, with_branch: bool, limit: Optional[int] = MAX_ROWS) -> str:
+        lines = []
+        for i in idx[:limit]:
+            rank = self.rank[i]
+            rank_s = str(int(rank)) if not np.isnan(rank) else "-"
+            perc = self.percentile[i]
+            perc_s = f"{perc:g}" if not np.isnan(perc) else "-"
+            category = self.categories[self.category_code[i]]
+            if with_branch:
+                lines.append(f"| {self.branches[self.branch_code[i]]} | {category} | {rank_s} | {perc_s} |")
+            else:
+                lines.append(f"| {category} | {rank_s} | {perc_s} |")
+        if limit is not None and len(idx) > limit:
+            lines.append(f"\n_Showing top {limit} of {len(idx)} matches._")
+        return "\n".join(lines) + "\n"
+
+    def branch_table(self, branch: str, category: Optional[str] = None) -> Optional[str]:
+        # Keep the original row order of the source data for a single branch
+        idx = np.sort(self.select(category=category, branch=branch))
+        name = self.branches[self._branch_lookup[branch.lower().strip()]] if len(idx) else branch
+        if not len(idx):
+            return None
+        md_table = f"### Cutoff for {name}\n\n"
+        md_table += "| Category | Rank | Percentile |\n"
+        md_table += "|----------|------|-------------|\n"
+        return md_table + self._rows(idx, with_branch=False, limit=None)
+
+    def _eligibility_table(self, percentile: Optional[float] = None, rank: Optional[float] = None,
+                           category: Optional[str] = None, min_percentile: Optional[float] = None,
+                           max_percentile: Optional[float] = None, min_rank: Optional[float] = None,
+                           max_rank: Optional[float] = None, branch: Optional[str] = None) -> str:
+        # Reserved/quota seats are not open to everyone: without a category, answer for OPEN only
+        if category:
+            who = f" ({category.replace(':', ', ').upper()})"
+        else:
+            category = DEFAULT_CATEGORY
+            who = " (OPEN category; mention your category for reserved seats)"
+        if branch:
+            who = f" in {branch}{who}"
+        if percentile is not None or rank is not None:
+            idx = self.eligible(percentile=percentile, rank=rank, category=category, branch=branch)
+            if len(eligible_categories(category)) > 1:
+                who = who[:-1] + " and OPEN seats)"
+            score = f"{percentile:g} percentile" if percentile is not None else f"rank {int(rank)}"
+            title = f"### Branches available with {score}{who}"
+        elif min_rank is not None:
+            idx = self.select(category=category, branch=branch, min_rank=min_rank, max_rank=max_rank,
+                              sort_by="rank", descending=False)
+            title = f"### Cutoffs between rank {int(min_rank)} and {int(max_rank)}{who}"
+        else:
+            idx = self.select(category=category, branch=branch,
+                              min_percentile=min_percentile, max_percentile=max_percentile)
+            title = f"### Cutoffs between {min_percentile:g} and {max_percentile:g} percentile{who}"
+
+        if not len(idx):
+            return f"No branches found{who} for the given score."
+        md_table = f"{title}\n\n"
+        md_table += "| Branch | Category | Rank | Percentile |\n"
+        md_table += "|--------|----------|------|-------------|\n"
+        return md_table + self._rows(idx, with_branch=True)
+
+    def answer(self, query: str) -> Optional[str]:
+        """Markdown answer for eligibility/range queries, or None if the query has no score."""
+        parsed = parse_cutoff_query(query)
+        if parsed is None:
+            return None
+        return self.eligibility_table(**parsed, branch=self.detect_branch(query.lower()))
+
+
+def load_cutoff_table(path: Path) -> Optional[CutoffTable]:
+    if not path.exists():
+        return None
+    return CutoffTable(path)
@@ -0,0 +1,267 @@
+import os
+import re
+import json
+import time
+import fcntl
+import shutil
+import hashlib
+import argparse
+from contextlib import contextmanager
+from typing import List, Optional
+
+import numpy as np
+from tqdm import tqdm
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BASE = os.path.dirname(__file__)
+EMBED_CACHE_DIR = os.getenv("EMBED_CACHE_DIR", os.path.join(BASE, "data", "embedding_cache"))
+EMBED_CACHE_MAX_MB = float(os.getenv("EMBED_CACHE_MAX_MB", "1024"))
+EMBED_CACHE_ENABLED = os.getenv("EMBED_CACHE", "true").lower() == "true"
+
+VECTORS_FILE = "vectors.f32"
+INDEX_FILE = "index.json"
+LOCK_FILE = ".lock"
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _slug(model_name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "__", model_name)
+
+
+class EmbeddingCache:
+    """Persistent embedding cache keyed by (model name, text hash).
+
+    One directory per model holds an append-only float32 matrix (read back via
+    np.memmap) and an index.json mapping text hash -> [row, last_used]. When the
+    total size exceeds `max_bytes`, least recently used rows are dropped across
+    all models and the affected matrices are compacted.
+
+    Several processes (e.g. gunicorn workers) may share one cache: each model
+    directory is guarded by an exclusive flock held around load -> append -> save
+    and around compaction, and eviction holds a lock on the cache root.
+    """
+
+    def __init__(self, root: str = EMBED_CACHE_DIR, max_mb: float = EMBED_CACHE_MAX_MB):
+        self.root = root
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        os.makedirs(root, exist_ok=True)
+
+    # ---------- Storage helpers ----------
+    @contextmanager
+    def _lock(self, directory: str):
+        """Exclusive inter-process lock on `directory` (created if needed)."""
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, LOCK_FILE), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _dir(self, model_name: str) -> str:
+        return os.path.join(self.root, _slug(model_name))
+
+    def _load_index(self, model_dir: str, model_name: Optional[str] = None) -> dict:
+        path = os.path.join(model_dir, INDEX_FILE)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        return {"model": model_name, "dim": None, "rows": {}}
+
+    def _save_index(self, model_dir: str, index: dict):
+        os.makedirs(model_dir, exist_ok=True)
+        tmp = os.path.join(model_dir, INDEX_FILE + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(tmp, os.path.join(model_dir, INDEX_FILE))
+
+    def _vectors(self, model_dir: str, dim: int) -> np.memmap:
+        path = os.path.join(model_dir, VECTORS_FILE)
+        n_rows = os.path.getsize(path) // (4 * dim)
+        return np.memmap(path, dtype="float32", mode="r", shape=(n_rows, dim))
+
+    def _append(self, model_dir: str, embs: np.ndarray) -> int:
+        """Append rows to the matrix; returns the row number of the first new row."""
+        os.makedirs(model_dir, exist_ok=True)
+        path = os.path.join(model_dir, VECTORS_FILE)
+        start = os.path.getsize(path) // (4 * embs.shape[1]) if os.path.exists(path) else 0
+        with open(path, "ab") as f:
+            f.write(np.ascontiguousarray(embs, dtype="float32").tobytes())
+        return start
+
+    # ---------- Public API ----------
+    def encode(self, model, model_name: str, texts: List[str],
+               batch_size: int = 64, desc: Optional[str] = None) -> np.ndarray:
+        """Embed `texts` with `model` (SentenceTransformer or OnnxEncoder), encoding only uncached ones."""
+        if not texts:
+            return np.zeros((0, model.get_sentence_embedding_dimension()), dtype="float32")
+
+        model_dir = self._dir(model_name)
+        hashes = [text_hash(t) for t in texts]
+        encoded = {}  # text hash -> vector encoded by this call
+        while True:
+            with self._lock(model_dir):
+                rows = self._load_index(model_dir, model_name)["rows"]
+                missing = {}
+                for h, t in zip(hashes, texts):
+                    if h not in rows and h not in encoded and h not in missing:
+                        missing[h] = t
+
+            # Encode outside the lock; other processes may add or compact rows meanwhile
+            if missing:
+                miss_texts = list(missing.values())
+                print(f"Embedding cache [{model_name}]: {len(texts) - len(miss_texts)} hits, "
+                      f"{len(miss_texts)} to encode")
+                batches = []
+                for i in tqdm(range(0, len(miss_texts), batch_size), desc=desc, disable=desc is None):
+                    batches.append(model.encode(
+                        miss_texts[i:i + batch_size],
+                        show_progress_bar=False,
+                        convert_to_numpy=True,
+                        batch_size=batch_size
+                    ))
+                encoded.update(zip(missing, np.vstack(batches).astype("float32")))
+
+            with self._lock(model_dir):
+                # Re-read under the lock so rows appended or renumbered by other processes are kept
+                index = self._load_index(model_dir, model_name)
+                rows = index["rows"]
+                if any(h not in rows and h not in encoded for h in hashes):
+                    continue  # a hit was evicted by another process meanwhile; encode it too
+
+                fresh = [h for h in dict.fromkeys(hashes) if h not in rows]
+                if fresh:
+                    dim = encoded[fresh[0]].shape[0]
+                    if index["dim"] is not None and index["dim"] != dim:
+                        raise ValueError(f"Embedding cache dim mismatch for {model_name}: "
+                                         f"{index['dim']} vs {dim}")
+                    index["dim"] = int(dim)
+                    start = self._append(model_dir, np.stack([encoded[h] for h in fresh]))
+                    for i, h in enumerate(fresh):
+                        rows[h] = [start + i, 0.0]
+
+                now = time.time()
+                for h in hashes:
+                    rows[h][1] = now
+                vectors = self._vectors(model_dir, index["dim"])
+                out = np.array(vectors[[rows[h][0] for h in hashes]], dtype="float32")
+                del vectors
+                self._save_index(model_dir, index)
+                break
+
+        self.evict()
+        return out
+
+    def size_bytes(self) -> int:
+        total = 0
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name, VECTORS_FILE)
+            if os.path.exists(path):
+                total += os.path.getsize(path)
+        return total
+
+    def evict(self):
+        """Drop least recently used rows until the cache is under 90% of max size."""
+        if self.size_bytes() <= self.max_bytes:
+            return
+
+        with self._lock(self.root):
+            total = self.size_bytes()
+            if total <= self.max_bytes:
+                return  # another process evicted first
+
+            entries = []
+            for name in os.listdir(self.root):
+                model_dir = os.path.join(self.root, name)
+                if not os.path.isdir(model_dir):
+                    continue
+                index = self._load_index(model_dir)
+                if not index["dim"]:
+                    continue
+                row_bytes = 4 * index["dim"]
+                entries.extend((last_used, model_dir, h, row_bytes) for h, (_, last_used) in index["rows"].items())
+
+            target = int(self.max_bytes * 0.9)
+            dropped = {}
+            for last_used, model_dir, h, row_bytes in sorted(entries):
+                if total <= target:
+                    break
+                dropped.setdefault(model_dir, set()).add(h)
+                total -= row_bytes
+
+            for model_dir, hashes in dropped.items():
+                with self._lock(model_dir):
+                    # Reload: rows may have been appended since the snapshot above
+                    self._compact(model_dir, self._load_index(model_dir), hashes)
+            print(f"Embedding cache evicted {sum(len(h) for h in dropped.values())} entries")
+
+    def _compact(self, model_dir: str, index: dict, drop: set):
+        """Rewrite the matrix without `drop`; caller holds the model directory lock."""
+        keep = [(h, v) for h, v in index["rows"].items() if h not in drop]
+        if not keep:
+            # Keep the directory (and its lock file) so waiting processes lock the same file
+            for name in (VECTORS_FILE, INDEX_FILE):
+                path = os.path.join(model_dir, name)
+                if os.path.exists(path):
+                    os.remove(path)
+            return
+        vectors = self._vectors(model_dir, index["dim"])
+        kept = np.array(vectors[[row for _, (row, _) in keep]], dtype="float32")
+        del vectors
+        tmp = os.path.join(model_dir, VECTORS_FILE + ".tmp")
+        kept.tofile(tmp)
+        os.replace(tmp, os.path.join(model_dir, VECTORS_FILE))
+        index["rows"] = {h: [i, last_used] for i, (h, (_, last_used)) in enumerate(keep)}
+        self._save_index(model_dir, index)
+
+    def stats(self) -> dict:
+        models = {}
+        for name in sorted(os.listdir(self.root)):
+            model_dir = os.path.join(self.root, name)
+            if os.path.isdir(model_dir):
+                index = self._load_index(model_dir)
+                models[index.get("model") or name] = {"entries": len(index["rows"]), "dim": index["dim"]}
+        return {"size_mb": round(self.size_bytes() / 1024 / 1024, 2), "max_mb": self.max_bytes / 1024 / 1024,
+                "models": models}
+
+
+_cache: Optional[EmbeddingCache] = None
+def cached_encode(model, model_name: str, texts: List[str],
+                  batch_size: int = 64, desc: Optional[str] = None) -> np.ndarray:
+    """Shared entry point for index builders; falls back to plain encoding when EMBED_CACHE=false."""
+    global _cache
+    if not EMBED_CACHE_ENABLED:
+        return model.encode(texts, convert_to_numpy=True, batch_size=batch_size,
+                            show_progress_bar=desc is not None).astype("float32")
+    if _cache is None:
+        _cache = EmbeddingCache()
+    # ONNX/int8 encoders produce slightly different vectors; keep them in their own namespace
+    model_name += getattr(model, "cache_suffix", "")
+    return _cache.encode(model, model_name, texts, batch_size=batch_size, desc=desc)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Persistent embedding cache")
+    parser.add_argument("--stats", action="store_true", help="Show cache size per model")
+    parser.add_argument("--clear", action="store_true", help="Delete all cached embeddings")
+    args = parser.parse_args()
+
+    if args.clear:
+        shutil.rmtree(EMBED_CACHE_DIR, ignore_errors=True)
+        print(f"Cleared {EMBED_CACHE_DIR}")
+        return
+
+    if args.stats:
+        print(json.dumps(EmbeddingCache().stats(), indent=2))
+        return
+
+    parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
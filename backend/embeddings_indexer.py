@@ -7,10 +7,11 @@ import argparse
 import hashlib
 from typing import List, Dict, Any, Optional
 from dotenv import load_dotenv
-from sentence_transformers import SentenceTransformer, CrossEncoder
+from embedding_cache import cached_encode
+from encoder_backend import load_encoder
+from html_chunker import chunk_html_dir, check_html_dir, MANIFEST_FILE
 
 import numpy as np
-from tqdm import tqdm
 import faiss
 
 # ---- Load ENV ----
@@ -25,6 +26,7 @@ TEXT_FILE = os.path.join(DATA_DIR, "college.txt")
 CHUNKS_FILE = os.path.join(DATA_DIR, "docs_chunks.json")
 FAISS_INDEX_FILE = os.path.join(DATA_DIR, "faiss_index.bin")
 FAISS_META_FILE = os.path.join(DATA_DIR, "faiss_meta.pkl")
+HTML_DIR = os.path.join(DATA_DIR, "html")
 
 # ---- Models & hyperparams ----
 EMBED_MODEL_NAME = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-mpnet-base-v2")
@@ -120,11 +122,8 @@ def stream_chunks_from_file(
 #               INDEX BUILD / LOAD / SEARCH
 # =====================================================
 
-def build_index(
-    embedding_model_name: str = EMBED_MODEL_NAME,
-    use_qa_model: bool = False
-):
-    print("Reading + chunking files...")
+def collect_text_chunks() -> List[Dict[str, Any]]:
+    """Chunk flattened text sources (college.txt or *.txt/*.md/*.html in DATA_DIR)."""
     if os.path.exists(TEXT_FILE):
         files = [TEXT_FILE]
     else:
@@ -139,6 +138,20 @@ def build_index(
         file_chunks = stream_chunks_from_file(fp)
         for ch in file_chunks:
             all_chunks.append({"source": os.path.basename(fp), **ch})
+    return all_chunks
+
+
+def build_index(
+    embedding_model_name: str = EMBED_MODEL_NAME,
+    use_qa_model: bool = False,
+    use_html: bool = True
+):
+    print("Reading + chunking files...")
+    if use_html and os.path.exists(os.path.join(HTML_DIR, MANIFEST_FILE)):
+        # Scraped pages: section-aware chunks with URL provenance, parsed in parallel
+        all_chunks = chunk_html_dir(HTML_DIR)
+    else:
+        all_chunks = collect_text_chunks()
 
     if not all_chunks:
         raise RuntimeError("No chunks produced. Check your input files.")
@@ -148,20 +161,12 @@ def build_index(
     # ---- Embeddings ----
     model_name = QA_EMBED_MODEL_NAME if use_qa_model else embedding_model_name
     print(f"Loading embedding model: {model_name}")
+    from sentence_transformers import SentenceTransformer
     embedder = SentenceTransformer(model_name)
     print(f" Embedding dim: {embedder.get_sentence_embedding_dimension()}")
 
-    embeddings = []
     texts = [c["text"] for c in all_chunks]
-    for i in tqdm(range(0, len(texts), BATCH_SIZE), desc="Encoding"):
-        embs = embedder.encode(
-            texts[i:i + BATCH_SIZE],
-            show_progress_bar=False,
-            convert_to_numpy=True,
-            batch_size=BATCH_SIZE
-        )
-        embeddings.append(embs)
-    arr = np.vstack(embeddings).astype("float32")
+    arr = cached_encode(embedder, model_name, texts, batch_size=BATCH_SIZE, desc="Encoding")
     faiss.normalize_L2(arr)
 
     dim = arr.shape[1]
@@ -197,7 +202,7 @@ def load_index_and_meta(
     with open(meta_path, "rb") as f:
         meta = pickle.load(f)
 
-    embedder = SentenceTransformer(embed_model_name)
+    embedder = load_encoder(embed_model_name)
     model_dim = embedder.get_sentence_embedding_dimension()
     index_dim = index.d
     print(f"ℹ Model dim={model_dim}, Index dim={index_dim}")
@@ -216,6 +221,7 @@ def get_cross_encoder(model_name: str = CROSS_ENCODER_MODEL):
     global _cross_encoder
     if _cross_encoder is None:
         print(f"Loading cross encoder: {model_name}")
+        from sentence_transformers import CrossEncoder
         _cross_encoder = CrossEncoder(model_name)
     return _cross_encoder
 
@@ -259,13 +265,21 @@ def main():
     parser = argparse.ArgumentParser(description="FAISS chatbot indexer + search")
     parser.add_argument("--build", action="store_true", help="Build embeddings + FAISS index")
     parser.add_argument("--use_qa_model", action="store_true", help="Use QA-optimized embedding model")
+    parser.add_argument("--no_html", action="store_true", help="Chunk college.txt instead of scraped HTML pages")
+    parser.add_argument("--check_html", action="store_true",
+                        help="Check that the HTML chunker keeps all visible page text")
     parser.add_argument("--search", type=str, help="Run a quick search query")
     parser.add_argument("--top_k", type=int, default=5)
     parser.add_argument("--no_rerank", action="store_true")
     args = parser.parse_args()
 
     if args.build:
-        build_index(use_qa_model=args.use_qa_model)
+        build_index(use_qa_model=args.use_qa_model, use_html=not args.no_html)
+        return
+
+    if args.check_html:
+        if check_html_dir(HTML_DIR):
+            raise SystemExit(1)
         return
 
     if args.search:
@@ -273,7 +287,8 @@ def main():
         for i, r in enumerate(results, 1):
             meta = r["meta"]
             score = r.get("rerank_score", r["score"])
-            print(f"\nResult {i}: score={score:.4f} source={meta.get('source')}")
+            print(f"\nResult {i}: score={score:.4f} source={meta.get('url') or meta.get('source')} "
+                  f"section={meta.get('section')}")
             print(meta.get("text", "")[:300], "...")
         return
 
@@ -0,0 +1,282 @@
+import os
+import re
+import json
+import time
+import argparse
+from typing import List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# ---- Paths / defaults ----
+BASE = os.path.dirname(__file__)
+ONNX_DIR = os.getenv("ONNX_DIR", os.path.join(BASE, "data", "onnx"))
+
+# torch: SentenceTransformer (PyTorch fp32)
+# onnx:  ONNX Runtime only, never imports torch; fails if the model was not exported
+# auto:  ONNX if an export exists, otherwise SentenceTransformer
+ENCODER_BACKEND = os.getenv("ENCODER_BACKEND", "torch").lower()
+ONNX_QUANTIZED = os.getenv("ONNX_QUANTIZED", "true").lower() == "true"
+ONNX_THREADS = int(os.getenv("ONNX_THREADS", "0"))
+
+CONFIG_FILE = "encoder_config.json"
+FP32_FILE = "model.onnx"
+INT8_FILE = "model.int8.onnx"
+
+PARITY_MIN_COSINE = 0.98
+
+SAMPLE_SENTENCES = [
+    "What is the cutoff for computer engineering?",
+    "Which branches can I get with 95 percentile as OBC?",
+    "What are the hostel facilities for first year students?",
+    "Who is the principal of Dr. D. Y. Patil Institute of Technology?",
+    "Tell me about placements and the companies that visit the campus.",
+    "What documents are required for the admission process?",
+    "Is there a library and how late is it open?",
+    "How are internal exam marks calculated in each semester?",
+]
+
+
+def onnx_model_dir(model_name: str) -> str:
+    return os.path.join(ONNX_DIR, re.sub(r"[^A-Za-z0-9_.-]+", "__", model_name))
+
+
+# =====================================================
+#               ONNX RUNTIME ENCODER
+# =====================================================
+
+class OnnxEncoder:
+    """Drop-in replacement for SentenceTransformer.encode backed by ONNX Runtime.
+
+    Uses the `tokenizers` library and numpy pooling only, so the serving
+    process does not need to import torch.
+    """
+
+    def __init__(self, model_dir: str, quantized: bool = ONNX_QUANTIZED, num_threads: int = ONNX_THREADS):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        with open(os.path.join(model_dir, CONFIG_FILE), "r", encoding="utf-8") as f:
+            self.config = json.load(f)
+
+        model_file = INT8_FILE if quantized and os.path.exists(os.path.join(model_dir, INT8_FILE)) else FP32_FILE
+        opts = ort.SessionOptions()
+        if num_threads:
+            opts.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(os.path.join(model_dir, model_file), opts,
+                                            providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+        self.cache_suffix = "@onnx-int8" if model_file == INT8_FILE else "@onnx"
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.config["max_seq_length"])
+        self.tokenizer.enable_padding(pad_id=self.config["pad_token_id"], pad_token=self.config["pad_token"])
+        print(f"Loaded ONNX encoder {self.config['model_name']} ({model_file})")
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.config["dim"]
+
+    def _pool(self, hidden: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        mode = self.config["pooling"]
+        if mode == "cls":
+            return hidden[:, 0]
+        m = mask[..., None].astype(hidden.dtype)
+        if mode == "max":
+            return np.where(m > 0, hidden, -1e9).max(axis=1)
+        return (hidden * m).sum(axis=1) / np.clip(m.sum(axis=1), 1e-9, None)
+
+    def encode(self, sentences, batch_size: int = 32, convert_to_numpy: bool = True,
+               show_progress_bar: bool = False, normalize_embeddings: bool = False, **kwargs) -> np.ndarray:
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+
+        out = []
+        for i in range(0, len(sentences), batch_size):
+            enc = self.tokenizer.encode_batch(list(sentences[i:i + batch_size]))
+            feed = {
+                "input_ids": np.array([e.ids for e in enc], dtype=np.int64),
+                "attention_mask": np.array([e.attention_mask for e in enc], dtype=np.int64),
+                "token_type_ids": np.array([e.type_ids for e in enc], dtype=np.int64),
+            }
+            hidden = self.session.run(None, {k: feed[k] for k in self.input_names})[0]
+            out.append(self._pool(hidden, feed["attention_mask"]))
+
+        embs = np.vstack(out).astype("float32") if out else np.zeros((0, self.config["dim"]), dtype="float32")
+        if self.config["normalize"] or normalize_embeddings:
+            embs /= np.maximum(np.linalg.norm(embs, axis=1, keepdims=True), 1e-12)
+        return embs[0] if single else embs
+
+
+def load_encoder(model_name: str, backend: str = ENCODER_BACKEND):
+    """Return an encoder exposing `encode` / `get_sentence_embedding_dimension` for the chosen backend."""
+    model_dir = onnx_model_dir(model_name)
+    exported = os.path.exists(os.path.join(model_dir, CONFIG_FILE))
+
+    if backend == "onnx":
+        if not exported:
+            raise FileNotFoundError(
+                f"No ONNX export for {model_name}. Run: python encoder_backend.py --export {model_name}"
+            )
+        return OnnxEncoder(model_dir)
+    if backend == "auto" and exported:
+        return OnnxEncoder(model_dir)
+
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name)
+
+
+# =====================================================
+#               EXPORT / PARITY / BENCHMARK
+# =====================================================
+
+def export_onnx(model_name: str, quantize: bool = True, opset: int = 14) -> str:
+    """Export a SentenceTransformer's transformer to ONNX (+ dynamic int8 weights)."""
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    out_dir = onnx_model_dir(model_name)
+    os.makedirs(out_dir, exist_ok=True)
+
+    st = SentenceTransformer(model_name, device="cpu")
+    transformer, pooling = st[0], st[1]
+    hf_model, tokenizer = transformer.auto_model.eval(), transformer.tokenizer
+
+    dummy = tokenizer(["export sample sentence"], return_tensors="pt", padding=True)
+    input_names = [k for k in ("input_ids", "attention_mask", "token_type_ids") if k in dummy]
+
+    class _Wrapper(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, *inputs):
+            return self.model(**dict(zip(input_names, inputs))).last_hidden_state
+
+    fp32_path = os.path.join(out_dir, FP32_FILE)
+    dynamic_axes = {k: {0: "batch", 1: "seq"} for k in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "seq"}
+    print(f"Exporting {model_name} to {fp32_path}")
+    with torch.no_grad():
+        torch.onnx.export(
+            _Wrapper(hf_model), tuple(dummy[k] for k in input_names), fp32_path,
+            input_names=input_names, output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes, opset_version=opset,
+        )
+
+    if quantize:
+        print("Quantizing weights to int8 (dynamic)")
+        quantize_dynamic(fp32_path, os.path.join(out_dir, INT8_FILE), weight_type=QuantType.QInt8)
+
+    tokenizer.save_pretrained(out_dir)
+    if pooling.pooling_mode_cls_token:
+        pooling_mode = "cls"
+    elif pooling.pooling_mode_max_tokens:
+        pooling_mode = "max"
+    else:
+        pooling_mode = "mean"
+    config = {
+        "model_name": model_name,
+        "dim": st.get_sentence_embedding_dimension(),
+        "max_seq_length": st.max_seq_length,
+        "pooling": pooling_mode,
+        "normalize": any(type(m).__name__ == "Normalize" for m in st),
+        "pad_token": tokenizer.pad_token,
+        "pad_token_id": tokenizer.pad_token_id,
+    }
+    with open(os.path.join(out_dir, CONFIG_FILE), "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+    print(f"Export complete: {out_dir}")
+    return out_dir
+
+
+def load_sample_sentences(limit: int = 256) -> List[str]:
+    """Real chunks from the built index if available, else a fixed query sample."""
+    chunks_file = os.path.join(BASE, "data", "docs_chunks.json")
+    if os.path.exists(chunks_file):
+        with open(chunks_file, "r", encoding="utf-8") as f:
+            chunks = [c["text"] for c in json.load(f)[:limit]]
+        return SAMPLE_SENTENCES + chunks
+    return SAMPLE_SENTENCES
+
+
+def parity_check(model_name: str, sentences: Optional[List[str]] = None,
+                 quantized: bool = ONNX_QUANTIZED) -> dict:
+    """Cosine similarity between SentenceTransformer and ONNX embeddings of the same texts."""
+    from sentence_transformers import SentenceTransformer
+
+    sentences = sentences or load_sample_sentences()
+    ref = SentenceTransformer(model_name, device="cpu").encode(sentences, convert_to_numpy=True)
+    got = OnnxEncoder(onnx_model_dir(model_name), quantized=quantized).encode(sentences)
+
+    ref = ref / np.linalg.norm(ref, axis=1, keepdims=True)
+    got = got / np.linalg.norm(got, axis=1, keepdims=True)
+    cos = (ref * got).sum(axis=1)
+    result = {"n": len(sentences), "mean_cosine": float(cos.mean()), "min_cosine": float(cos.min()),
+              "passed": bool(cos.min() >= PARITY_MIN_COSINE)}
+    print(f"Parity {model_name}: mean={result['mean_cosine']:.4f} min={result['min_cosine']:.4f} "
+          f"({'OK' if result['passed'] else f'below {PARITY_MIN_COSINE}'})")
+    return result
+
+
+def benchmark(model_name: str, sentences: Optional[List[str]] = None,
+              batch_size: int = 32, repeats: int = 3) -> dict:
+    """Sentences/sec for torch fp32 vs ONNX fp32 vs ONNX int8, plus single-query latency."""
+    from sentence_transformers import SentenceTransformer
+
+    sentences = sentences or load_sample_sentences()
+    model_dir = onnx_model_dir(model_name)
+    encoders = {"torch-fp32": SentenceTransformer(model_name, device="cpu"),
+                "onnx-fp32": OnnxEncoder(model_dir, quantized=False)}
+    if os.path.exists(os.path.join(model_dir, INT8_FILE)):
+        encoders["onnx-int8"] = OnnxEncoder(model_dir, quantized=True)
+
+    results = {}
+    for name, enc in encoders.items():
+        enc.encode(sentences[:batch_size], batch_size=batch_size)  # warm-up
+        start = time.perf_counter()
+        for _ in range(repeats):
+            enc.encode(sentences, batch_size=batch_size)
+        throughput = repeats * len(sentences) / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for s in SAMPLE_SENTENCES:
+            enc.encode([s])
+        latency_ms = 1000 * (time.perf_counter() - start) / len(SAMPLE_SENTENCES)
+
+        results[name] = {"sentences_per_sec": round(throughput, 1), "query_latency_ms": round(latency_ms, 2)}
+        print(f"{name:>11}: {throughput:8.1f} sent/s  {latency_ms:7.2f} ms/query")
+    return results
+
+
+# =====================================================
+#                   CLI
+# =====================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="ONNX Runtime encoder export / parity / benchmark")
+    parser.add_argument("models", nargs="+", help="Sentence-transformers model names")
+    parser.add_argument("--export", action="store_true", help="Export to ONNX (+ int8 quantization)")
+    parser.add_argument("--no_quantize", action="store_true", help="Skip int8 quantization on export")
+    parser.add_argument("--parity", action="store_true", help="Compare embeddings against PyTorch")
+    parser.add_argument("--bench", action="store_true", help="Throughput benchmark")
+    args = parser.parse_args()
+
+    if not (args.export or args.parity or args.bench):
+        parser.print_help()
+        return
+
+    for model_name in args.models:
+        if args.export:
+            export_onnx(model_name, quantize=not args.no_quantize)
+        if args.parity:
+            parity_check(model_name)
+        if args.bench:
+            benchmark(model_name)
+
+
+if __name__ == "__main__":
+    main()
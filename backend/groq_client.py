@@ -1,24 +1,312 @@
 import os
+import re
+import time
+import random
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Optional
 from dotenv import load_dotenv
 import aiohttp
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Always strip to avoid hidden newlines/spaces
 GROQ_API_KEY = os.getenv("GROQ_API_KEY", "").strip()
 GROQ_MODEL = os.getenv("GROQ_MODEL", "llama-3.1-8b-instant").strip()
+# Override to point at a local mock server (see mock_groq_server.py)
+GROQ_API_URL = os.getenv("GROQ_API_URL", "https://api.groq.com/openai/v1/chat/completions").strip()
+
+# ---- Resilience tuning ----
+GROQ_TIMEOUT = float(os.getenv("GROQ_TIMEOUT", "20"))              # total deadline per call (s)
+GROQ_ATTEMPT_TIMEOUT = float(os.getenv("GROQ_ATTEMPT_TIMEOUT", "10"))  # single HTTP attempt (s)
+GROQ_MAX_RETRIES = int(os.getenv("GROQ_MAX_RETRIES", "3"))
+GROQ_BACKOFF_BASE = float(os.getenv("GROQ_BACKOFF_BASE", "0.5"))
+GROQ_BACKOFF_MAX = float(os.getenv("GROQ_BACKOFF_MAX", "8"))
+GROQ_RPM = float(os.getenv("GROQ_RPM", "30"))                      # client-side requests/minute
+GROQ_HEDGE = os.getenv("GROQ_HEDGE", "false").lower() == "true"
+GROQ_HEDGE_MIN_DELAY = float(os.getenv("GROQ_HEDGE_MIN_DELAY", "1.0"))
+GROQ_BREAKER_THRESHOLD = int(os.getenv("GROQ_BREAKER_THRESHOLD", "5"))
+GROQ_BREAKER_COOLDOWN = float(os.getenv("GROQ_BREAKER_COOLDOWN", "30"))
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
 
 if not GROQ_API_KEY:
     raise ValueError("Please set GROQ_API_KEY in .env")
 
-async def groq_generate_async(system_prompt: str, user_prompt: str,
-                              max_tokens: int = 512, temperature: float = 0.0) -> str:
-    """Async Groq call."""
-    url = "https://api.groq.com/openai/v1/chat/completions"   #  correct endpoint
+
+class GroqError(RuntimeError):
+    """Groq call failed. `retryable` marks throttling/transient errors."""
+
+    def __init__(self, message: str, status: Optional[int] = None,
+                 retryable: bool = False, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status = status
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(GroqError):
+    """Raised without calling upstream while the circuit breaker is open."""
+
+
+class RateLimitWaitError(GroqError):
+    """Our own token bucket would delay the call past its deadline; upstream was not at fault."""
+
+
+# =====================================================
+#               RATE LIMIT HEADERS
+# =====================================================
+
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Parse Groq reset durations like '2m59.56s', '7.66s', '120ms' or plain seconds."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_RE.findall(value)
+    if not parts:
+        return None
+    return sum(float(num) * _DURATION_UNITS[unit] for num, unit in parts)
+
+
+class TokenBucket:
+    """Client-side request limiter that also follows x-ratelimit-* response headers.
+
+    State is guarded by a threading lock (not an asyncio one) because Flask
+    worker threads each drive their own event loop through `run_async`.
+    """
+
+    def __init__(self, rate_per_minute: float = GROQ_RPM, capacity: Optional[float] = None):
+        self.rate = max(rate_per_minute, 0.001) / 60.0
+        self.capacity = capacity if capacity is not None else max(1.0, rate_per_minute / 6.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """Take one token (possibly going into debt) and return how long to wait."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= 1.0
+            wait = 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+            return max(wait, self.blocked_until - now)
+
+    def try_acquire(self) -> bool:
+        """Take a token only if one is available right now (used for hedges)."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if self.tokens >= 1.0 and now >= self.blocked_until:
+                self.tokens -= 1.0
+                return True
+            return False
+
+    def refund(self):
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + 1.0)
+
+    def block_for(self, seconds: float):
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def update_from_headers(self, headers):
+        """Sync with upstream quota: pause until reset when requests or tokens run out."""
+        retry_after = parse_duration(headers.get("retry-after"))
+        if retry_after:
+            self.block_for(retry_after)
+        for kind in ("requests", "tokens"):
+            remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+            reset = parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+            if remaining is None or reset is None:
+                continue
+            try:
+                remaining = float(remaining)
+            except ValueError:
+                continue
+            if remaining <= 0:
+                self.block_for(reset)
+            elif kind == "requests":
+                with self._lock:
+                    self.tokens = min(self.tokens, remaining)
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies, used to pick the hedge delay."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.samples = deque(maxlen=window)
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self.samples.append(seconds)
+
+    def p95(self) -> Optional[float]:
+        with self._lock:
+            if len(self.samples) < self.min_samples:
+                return None
+            ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+
+
+class CircuitBreaker:
+    """Closed -> open after `threshold` consecutive failures; one probe after `cooldown`."""
+
+    def __init__(self, threshold: int = GROQ_BREAKER_THRESHOLD, cooldown: float = GROQ_BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.monotonic() - self.opened_at >= self.cooldown:
+                return "half-open"
+            return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.cooldown or self.probing:
+                return False
+            self.probing = True
+            return True
+
+    def release(self):
+        """Give back a half-open probe slot without judging upstream health."""
+        with self._lock:
+            self.probing = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.probing or self.failures >= self.threshold:
+                if self.opened_at is None or self.probing:
+                    logger.warning("Groq circuit breaker opened after %d failures", self.failures)
+                self.opened_at = time.monotonic()
+            self.probing = False
+
+
+limiter = TokenBucket()
+latency = LatencyTracker()
+breaker = CircuitBreaker()
+
+
+# =====================================================
+#               HTTP CALLS
+# =====================================================
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff."""
+    return random.uniform(0, min(GROQ_BACKOFF_MAX, GROQ_BACKOFF_BASE * (2 ** attempt)))
+
+
+async def _post_once(payload: dict, timeout: float) -> str:
     headers = {
         "Authorization": f"Bearer {GROQ_API_KEY}",
         "Content-Type": "application/json"
     }
+    started = time.monotonic()
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+    try:
+        async with aiohttp.ClientSession(timeout=client_timeout) as session:
+            async with session.post(GROQ_API_URL, headers=headers, json=payload) as resp:
+                limiter.update_from_headers(resp.headers)
+                if resp.status != 200:
+                    error_text = await resp.text()
+                    raise GroqError(
+                        f"Groq API failed: {resp.status} {error_text}",
+                        status=resp.status,
+                        retryable=resp.status in RETRYABLE_STATUS,
+                        retry_after=parse_duration(resp.headers.get("retry-after")),
+                    )
+                result = await resp.json()
+    except asyncio.TimeoutError as e:
+        raise GroqError(f"Groq API timed out after {timeout:.1f}s", retryable=True) from e
+    except aiohttp.ClientError as e:
+        raise GroqError(f"Groq API connection error: {e}", retryable=True) from e
+    except ValueError as e:  # 200 with a malformed JSON body
+        raise GroqError(f"Groq API returned invalid JSON: {e}", retryable=True) from e
+
+    try:
+        answer = result["choices"][0]["message"]["content"].strip()
+    except (KeyError, IndexError, TypeError, AttributeError) as e:
+        raise GroqError(f"Unexpected Groq response: {result!r:.200}") from e
+    latency.record(time.monotonic() - started)
+    return answer
+
+
+async def _post_hedged(payload: dict, timeout: float) -> str:
+    """Send a second request if the first is slower than the observed p95; first success wins."""
+    p95 = latency.p95()
+    primary = asyncio.ensure_future(_post_once(payload, timeout))
+    if p95 is None:
+        return await primary
+
+    delay = max(GROQ_HEDGE_MIN_DELAY, p95)
+    done, _ = await asyncio.wait({primary}, timeout=min(delay, timeout))
+    if done or not limiter.try_acquire():
+        return await primary
+
+    logger.info("Hedging Groq request after %.2fs", delay)
+    hedge = asyncio.ensure_future(_post_once(payload, max(timeout - delay, 0.1)))
+    pending = {primary, hedge}
+    error = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def groq_generate_async(system_prompt: str, user_prompt: str,
+                              max_tokens: int = 512, temperature: float = 0.0,
+                              deadline: float = GROQ_TIMEOUT) -> str:
+    """Async Groq call with deadline, jittered retries, rate limiting, hedging and a circuit breaker.
+
+    Raises CircuitOpenError while upstream is considered down, RateLimitWaitError when the
+    client-side limiter cannot admit the call before its deadline, GroqError otherwise.
+    Only upstream failures (HTTP errors, timeouts, connection errors) count towards the breaker.
+    """
+    if not breaker.allow():
+        raise CircuitOpenError("Groq circuit breaker is open")
+
     payload = {
         "model": GROQ_MODEL,
         "messages": [
@@ -29,10 +317,49 @@ async def groq_generate_async(system_prompt: str, user_prompt: str,
         "temperature": temperature,
     }
 
-    async with aiohttp.ClientSession() as session:
-        async with session.post(url, headers=headers, json=payload) as resp:
-            if resp.status != 200:
-                error_text = await resp.text()
-                raise RuntimeError(f"Groq API failed: {resp.status} {error_text}")
-            result = await resp.json()
-            return result["choices"][0]["message"]["content"].strip()
+    end = time.monotonic() + deadline
+    last_error: Optional[GroqError] = None
+    settled = False  # True once the breaker has recorded a success or failure for this call
+    try:
+        for attempt in range(GROQ_MAX_RETRIES + 1):
+            wait = limiter.reserve()
+            remaining = end - time.monotonic()
+            if wait >= remaining:
+                limiter.refund()
+                if last_error is None:
+                    # Only local pacing stopped us; this must not count towards the breaker
+                    raise RateLimitWaitError("Client rate limit wait exceeds Groq deadline",
+                                             status=429, retryable=True)
+                break
+            if wait > 0:
+                await asyncio.sleep(wait)
+                remaining = end - time.monotonic()
+
+            timeout = min(GROQ_ATTEMPT_TIMEOUT, remaining)
+            try:
+                if GROQ_HEDGE:
+                    answer = await _post_hedged(payload, timeout)
+                else:
+                    answer = await _post_once(payload, timeout)
+                breaker.record_success()
+                settled = True
+                return answer
+            except GroqError as e:
+                last_error = e
+                if not e.retryable:
+                    raise  # the request itself was bad (e.g. 401); says nothing about upstream health
+
+            sleep = last_error.retry_after if last_error.retry_after is not None else backoff_delay(attempt)
+            if attempt == GROQ_MAX_RETRIES or time.monotonic() + sleep >= end:
+                break
+            logger.warning("Groq attempt %d failed (%s); retrying in %.2fs", attempt + 1, last_error, sleep)
+            await asyncio.sleep(sleep)
+
+        breaker.record_failure()
+        settled = True
+        raise last_error
+    finally:
+        if not settled:
+            # Non-retryable errors, local rate limiting, cancellation or unexpected exceptions:
+            # free a half-open probe slot so the breaker can still close later
+            breaker.release()
@@ -0,0 +1,278 @@
+import os
+import re
+import json
+import hashlib
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional
+
+from bs4 import BeautifulSoup, NavigableString, Tag
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "300"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "30"))
+MIN_CHUNK_WORDS = int(os.getenv("MIN_CHUNK_WORDS", "20"))
+MIN_STRUCTURED_WORDS = 3  # tables, lists and sectioned prose are dense; keep short ones
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", str(os.cpu_count() or 1)))
+
+MANIFEST_FILE = "manifest.json"
+
+HEADINGS = ["h1", "h2", "h3", "h4", "h5", "h6"]
+BLOCKS = ["p", "ul", "ol", "table", "pre", "blockquote", "dl"]
+CONTAINERS = ["div", "section", "article", "main", "aside", "body", "figure", "figcaption",
+              "address", "center", "details", "summary", "li", "td", "th"]
+BOILERPLATE = ["script", "style", "noscript", "nav", "header", "footer", "iframe", "svg", "form"]
+
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def clean_text(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip()
+
+
+# =====================================================
+#               HTML -> SECTIONED BLOCKS
+# =====================================================
+
+def _table_rows(table) -> List[str]:
+    """Render each row as 'header: value | header: value' so rows stay self-describing."""
+    headers, rows = [], []
+    for tr in table.find_all("tr"):
+        cells = tr.find_all(["th", "td"])
+        values = [clean_text(c.get_text(" ")) for c in cells]
+        if not any(values):
+            continue
+        if not headers and all(c.name == "th" for c in cells):
+            headers = values
+            continue
+        if headers and len(headers) == len(values):
+            rows.append(" | ".join(f"{h}: {v}" for h, v in zip(headers, values) if v))
+        else:
+            rows.append(" | ".join(v for v in values if v))
+    return rows
+
+
+def _visible_soup(html: str):
+    soup = BeautifulSoup(html, "lxml")
+    for tag in soup(BOILERPLATE):
+        tag.decompose()
+    return soup.body or soup
+
+
+def _is_inline(tag) -> bool:
+    """Inline markup (span, a, strong, ...) that holds no headings, blocks or containers."""
+    return (tag.name not in HEADINGS + BLOCKS + CONTAINERS
+            and tag.find(HEADINGS + BLOCKS + CONTAINERS) is None)
+
+
+def iter_blocks(html: str):
+    """Yield (section, kind, parts) in document order; section is the heading path.
+
+    Text sitting directly in a container (e.g. a card div with an <h3> and loose text,
+    or body/section/article) is emitted as its own text block between the child blocks.
+    """
+    stack: List[tuple] = []  # (level, title)
+    inline: List[str] = []
+
+    def section():
+        return " > ".join(t for _, t in stack) or None
+
+    def flush():
+        text = clean_text(" ".join(inline))
+        inline.clear()
+        if text:
+            yield section(), "text", [text]
+
+    def walk(node):
+        nonlocal stack
+        for child in node.children:
+            if isinstance(child, NavigableString):
+                if type(child) is NavigableString:  # skip comments, doctype, CDATA
+                    inline.append(str(child))
+                continue
+            if not isinstance(child, Tag):
+                continue
+
+            if child.name == "br":
+                inline.append(" ")
+            elif _is_inline(child):
+                inline.append(child.get_text(" "))
+            elif child.name in HEADINGS:
+                yield from flush()
+                title = clean_text(child.get_text(" "))
+                if title:
+                    level = int(child.name[1])
+                    stack = [s for s in stack if s[0] < level] + [(level, title)]
+            elif child.name == "table":
+                yield from flush()
+                rows = _table_rows(child)
+                if rows:
+                    yield section(), "table", rows
+            elif child.name in ("ul", "ol", "dl"):
+                yield from flush()
+                items = [clean_text(li.get_text(" ")) for li in child.find_all(["li", "dt", "dd"], recursive=False)]
+                # Text outside li/dt/dd (rare, malformed lists) is kept as its own item
+                stray = clean_text(" ".join(str(t) for t in child.find_all(string=True, recursive=False)
+                                            if type(t) is NavigableString))
+                items = [i for i in items + [stray] if i]
+                if items:
+                    yield section(), "list", items
+            elif child.name in BLOCKS:
+                yield from flush()
+                text = clean_text(child.get_text(" "))
+                if text:
+                    yield section(), "text", [text]
+            else:
+                # Container: its loose text and child blocks are emitted in order
+                yield from flush()
+                yield from walk(child)
+                yield from flush()
+
+    body = _visible_soup(html)
+    yield from walk(body)
+    yield from flush()
+
+
+def dropped_words(html: str) -> List[str]:
+    """Visible, non-boilerplate words that iter_blocks failed to emit (should be empty)."""
+    emitted = Counter()
+    for _, _, parts in iter_blocks(html):
+        for part in parts:
+            emitted.update(_WORD_RE.findall(part.lower()))
+    body = _visible_soup(html)
+    for heading in body.find_all(HEADINGS):  # kept as the section path of the blocks below it
+        emitted.update(_WORD_RE.findall(heading.get_text(" ").lower()))
+    missing = []
+    for word in _WORD_RE.findall(body.get_text(" ").lower()):
+        if emitted[word] > 0:
+            emitted[word] -= 1
+        else:
+            missing.append(word)
+    return missing
+
+
+# =====================================================
+#               BLOCKS -> CHUNKS
+# =====================================================
+
+def _pack(units: List[str], chunk_size: int, overlap: int) -> List[str]:
+    """Greedily pack sentences/rows into chunks of ~chunk_size words with word overlap.
+
+    A unit longer than chunk_size (unpunctuated menus, long cells) is cut into
+    chunk_size-word windows, so no chunk outgrows the encoder's input length.
+    """
+    step = max(chunk_size - overlap, 1)
+    chunks, cur_words = [], []
+    for unit in units:
+        words = unit.split()
+        if len(cur_words) + len(words) > chunk_size and cur_words:
+            chunks.append(" ".join(cur_words))
+            # Never carry over more than half of a short previous chunk
+            keep = min(overlap, len(cur_words) // 2)
+            cur_words = cur_words[-keep:] if keep > 0 else []
+        cur_words.extend(words)
+        while len(cur_words) > chunk_size:
+            chunks.append(" ".join(cur_words[:chunk_size]))
+            cur_words = cur_words[step:]
+    if cur_words:
+        chunks.append(" ".join(cur_words))
+    return chunks
+
+
+def chunk_html(html: str, url: Optional[str] = None, source: Optional[str] = None,
+               chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> List[Dict[str, Any]]:
+    """Chunk one page without crossing section boundaries; tables/lists become their own chunks."""
+    chunks: List[Dict[str, Any]] = []
+    prose, prose_section = [], None
+
+    def flush():
+        # Loose text outside any heading is mostly page chrome; sectioned prose is kept even if short
+        min_words = MIN_CHUNK_WORDS if prose_section is None else MIN_STRUCTURED_WORDS
+        for text in _pack(prose, chunk_size, overlap):
+            if len(text.split()) >= min_words:
+                chunks.append({"text": text, "section": prose_section, "kind": "text"})
+        prose.clear()
+
+    for section, kind, parts in iter_blocks(html):
+        if section != prose_section:
+            flush()
+            prose_section = section
+        if kind == "text":
+            for part in parts:
+                prose.extend(re.split(r'(?<=[.!?])\s+', part))
+            continue
+        flush()
+        # Rows/items are joined with "; " so a chunk never splits one row
+        for text in _pack([p + ";" for p in parts], chunk_size, 0):
+            if len(text.split()) >= MIN_STRUCTURED_WORDS:
+                chunks.append({"text": text.rstrip(";"), "section": section, "kind": kind})
+    flush()
+
+    for c in chunks:
+        c["url"] = url
+        c["source"] = source
+    return chunks
+
+
+def _chunk_file(job) -> List[Dict[str, Any]]:
+    path, url = job
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        html = f.read()
+    return chunk_html(html, url=url, source=os.path.basename(path))
+
+
+def chunk_html_dir(html_dir: str, workers: int = PARSE_WORKERS) -> List[Dict[str, Any]]:
+    """Parse every page listed in the scraper manifest in parallel worker processes."""
+    with open(os.path.join(html_dir, MANIFEST_FILE), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    jobs = [(os.path.join(html_dir, name), url) for name, url in sorted(manifest.items())]
+
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_chunk_file, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+    else:
+        results = [_chunk_file(job) for job in jobs]
+
+    # Deduplicate boilerplate repeated across pages (first occurrence wins)
+    seen, uniq = set(), []
+    for page_chunks in results:
+        for c in page_chunks:
+            h = hashlib.sha1(c["text"].strip().encode("utf-8")).hexdigest()
+            if h not in seen:
+                seen.add(h)
+                uniq.append(c)
+    return uniq
+
+
+# =====================================================
+#               REGRESSION CHECK
+# =====================================================
+
+# Layouts that used to lose text: loose text next to a heading or block inside a container
+SAMPLE_PAGES = [
+    '<div class="card"><h3>Placements</h3>Our placement cell works with 200 recruiters.</div>',
+    "<div>Intro hostel text for first year students.<p>Hostel has wifi.</p></div>",
+    "<body>Loose <b>body</b> text<section>Section <a href='#'>intro</a><ul><li>Item</li></ul>tail</section></body>",
+]
+
+
+def check_html_dir(html_dir: Optional[str] = None) -> Dict[str, List[str]]:
+    """Pages (sample pages, plus every scraped page in html_dir) whose visible text iter_blocks drops."""
+    pages = {f"sample-{i}": html for i, html in enumerate(SAMPLE_PAGES)}
+    if html_dir and os.path.exists(os.path.join(html_dir, MANIFEST_FILE)):
+        with open(os.path.join(html_dir, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            for name in sorted(json.load(f)):
+                with open(os.path.join(html_dir, name), "r", encoding="utf-8", errors="ignore") as page:
+                    pages[name] = page.read()
+
+    failures = {}
+    for name, html in pages.items():
+        missing = dropped_words(html)
+        if missing:
+            failures[name] = missing
+            print(f"{name}: {len(missing)} words dropped, e.g. {' '.join(missing[:10])}")
+    print(f"HTML chunker check: {len(pages) - len(failures)}/{len(pages)} pages keep all visible text")
+    return failures
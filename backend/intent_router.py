@@ -0,0 +1,133 @@
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+import numpy as np
+
+# ---- Keyword automaton (whole-word, single compiled pass) ----
+# Strong terms alone are enough to route to cutoff; weak ones ("rank", "marks")
+# only count when the embedding classifier also leans towards cutoff.
+STRONG_CUTOFF_TERMS = ["cutoff", "cut off", "cut-off", "percentile", "%ile", "mht cet", "mht-cet",
+                       "mhtcet", "cet", "closing rank", "cap round"]
+WEAK_CUTOFF_TERMS = ["rank", "ranks", "marks", "score", "eligible", "eligibility", "chances"]
+
+_TERM_RE = re.compile(
+    r"(?<![a-z])(" + "|".join(
+        re.escape(t) for t in sorted(STRONG_CUTOFF_TERMS + WEAK_CUTOFF_TERMS, key=len, reverse=True)
+    ) + r")(?!\w)"
+)
+_STRONG = set(STRONG_CUTOFF_TERMS)
+
+# ---- Prototype queries for the embedding classifier ----
+CUTOFF_SEEDS = [
+    "what is the cutoff for computer engineering",
+    "mht cet cutoff rank for obc category",
+    "which branches can I get with 95 percentile",
+    "closing rank for mechanical engineering open category",
+    "what percentile is required for admission in information technology",
+    "can I get AI and data science with rank 15000",
+    "last year cutoff percentile for civil engineering",
+]
+GENERAL_SEEDS = [
+    "what are the hostel facilities",
+    "who is the principal of the college",
+    "tell me about placements and companies visiting",
+    "what is the fee structure",
+    "how are internal exam marks calculated",
+    "where is the college located",
+    "what clubs and events are there on campus",
+    "what documents are required for admission",
+]
+
+ROUTES = ("cutoff", "qa", "rag")
+
+
+@dataclass
+class Route:
+    name: str                      # one of ROUTES
+    confidence: float
+    qa_index: Optional[int] = None  # matched Q&A row when name == "qa"
+    reason: str = ""
+
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    x = np.asarray(x, dtype="float32")
+    return x / np.maximum(np.linalg.norm(x, axis=-1, keepdims=True), 1e-12)
+
+
+class IntentRouter:
+    """Pick the single stage (cutoff / qa / rag) for a query in one pass.
+
+    Uses the query embedding the caller has already computed: nearest-prototype
+    scores against cutoff vs. general seed queries, plus the best Q&A similarity
+    from the in-memory Q&A index.
+    """
+
+    def __init__(self, encode: Callable[[List[str]], np.ndarray], qa_index=None,
+                 qa_threshold: float = 0.75, cutoff_enabled: bool = True,
+                 cutoff_threshold: float = 0.55, weak_cutoff_threshold: float = 0.35):
+        self.cutoff_protos = _normalize(encode(CUTOFF_SEEDS))
+        self.general_protos = _normalize(encode(GENERAL_SEEDS))
+        self.qa_index = qa_index
+        self.qa_threshold = qa_threshold
+        self.cutoff_enabled = cutoff_enabled
+        self.cutoff_threshold = cutoff_threshold
+        self.weak_cutoff_threshold = weak_cutoff_threshold
+        self.counters = Counter()
+        self._lock = threading.Lock()
+
+    def keyword_hits(self, query_lower: str):
+        hits = _TERM_RE.findall(query_lower)
+        return [h for h in hits if h in _STRONG], [h for h in hits if h not in _STRONG]
+
+    def route(self, query: str, q_emb: np.ndarray) -> Route:
+        q = _normalize(q_emb).reshape(1, -1)
+        route = self._decide(query.lower(), q)
+        with self._lock:
+            self.counters[route.name] += 1
+            self.counters["total"] += 1
+        return route
+
+    def _decide(self, query_lower: str, q: np.ndarray) -> Route:
+        if self.cutoff_enabled:
+            strong, weak = self.keyword_hits(query_lower)
+            cutoff_sim = float((self.cutoff_protos @ q.T).max())
+            general_sim = float((self.general_protos @ q.T).max())
+            leans_cutoff = cutoff_sim > general_sim
+
+            if strong:
+                return Route("cutoff", max(0.9, cutoff_sim), reason=f"keyword:{strong[0]}")
+            if weak and leans_cutoff and cutoff_sim >= self.weak_cutoff_threshold:
+                return Route("cutoff", cutoff_sim, reason=f"keyword:{weak[0]}+embedding")
+            if leans_cutoff and cutoff_sim >= self.cutoff_threshold:
+                return Route("cutoff", cutoff_sim, reason="embedding")
+
+        return self._qa_or_rag(q)
+
+    def _qa_or_rag(self, q: np.ndarray, reason: str = "") -> Route:
+        qa_sim = 0.0
+        if self.qa_index is not None and self.qa_index.ntotal:
+            D, I = self.qa_index.search(q, 1)
+            qa_sim, qa_idx = float(D[0][0]), int(I[0][0])
+            if qa_idx >= 0 and qa_sim >= self.qa_threshold:
+                return Route("qa", qa_sim, qa_index=qa_idx, reason=reason + "qa-similarity")
+        return Route("rag", 1.0 - max(qa_sim, 0.0), reason=reason + "fallback")
+
+    def fallback(self, q_emb: np.ndarray) -> Route:
+        """Re-route after the cutoff stage found nothing: Q&A if it matches, else RAG.
+
+        Per-route counters count the route that finally served the request, so the miss
+        moves the request from `cutoff` to its new route (and into `cutoff_miss`).
+        """
+        route = self._qa_or_rag(_normalize(q_emb).reshape(1, -1), reason="cutoff-miss:")
+        with self._lock:
+            self.counters["cutoff"] -= 1
+            self.counters["cutoff_miss"] += 1
+            self.counters[route.name] += 1
+        return route
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {name: self.counters[name] for name in ROUTES + ("cutoff_miss", "total")}
@@ -0,0 +1,66 @@
+"""
+Local stand-in for the Groq chat completions endpoint, for exercising groq_client.py
+(retries, rate-limit headers, hedging, circuit breaker) without touching the real API.
+
+    python mock_groq_server.py --port 8081 --fail_rate 0.3 --throttle_rate 0.2 --slow_rate 0.1
+    GROQ_API_URL=http://localhost:8081/openai/v1/chat/completions python app.py
+"""
+import asyncio
+import argparse
+import random
+from aiohttp import web
+
+
+def make_app(fail_rate: float, throttle_rate: float, slow_rate: float,
+             latency: float, slow_latency: float, remaining: int) -> web.Application:
+    state = {"remaining": remaining}
+
+    async def chat_completions(request: web.Request) -> web.Response:
+        payload = await request.json()
+        roll = random.random()
+
+        if roll < throttle_rate:
+            return web.json_response(
+                {"error": {"message": "Rate limit reached", "type": "requests"}},
+                status=429,
+                headers={"retry-after": "1", "x-ratelimit-remaining-requests": "0",
+                         "x-ratelimit-reset-requests": "1s"},
+            )
+        if roll < throttle_rate + fail_rate:
+            return web.json_response({"error": {"message": "Service unavailable"}}, status=503)
+
+        delay = slow_latency if roll < throttle_rate + fail_rate + slow_rate else latency
+        await asyncio.sleep(delay)
+
+        state["remaining"] = state["remaining"] - 1 if state["remaining"] > 1 else remaining
+        question = payload["messages"][-1]["content"].splitlines()
+        return web.json_response(
+            {"choices": [{"message": {"role": "assistant",
+                                      "content": f"[mock] {question[-1][:80] if question else ''}"}}]},
+            headers={"x-ratelimit-remaining-requests": str(state["remaining"]),
+                     "x-ratelimit-reset-requests": "2m0s"},
+        )
+
+    app = web.Application()
+    app.router.add_post("/openai/v1/chat/completions", chat_completions)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock Groq API server")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--fail_rate", type=float, default=0.0, help="Fraction of 503 responses")
+    parser.add_argument("--throttle_rate", type=float, default=0.0, help="Fraction of 429 responses")
+    parser.add_argument("--slow_rate", type=float, default=0.0, help="Fraction of slow (tail) responses")
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--slow_latency", type=float, default=5.0)
+    parser.add_argument("--remaining", type=int, default=30, help="Requests per reported quota window")
+    args = parser.parse_args()
+
+    app = make_app(args.fail_rate, args.throttle_rate, args.slow_rate,
+                   args.latency, args.slow_latency, args.remaining)
+    web.run_app(app, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
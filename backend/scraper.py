@@ -1,3 +1,6 @@
+import os
+import json
+import hashlib
 import requests
 from bs4 import BeautifulSoup
 import re
@@ -7,8 +10,12 @@ from collections import deque
 BASE_URL = "https://engg.dypvp.edu.in"
 DOMAIN = "engg.dypvp.edu.in"
 
+HTML_DIR = "data/html"   # raw pages for the section-aware chunker (html_chunker.py)
+os.makedirs(HTML_DIR, exist_ok=True)
+
 visited = set()
 data = {}
+pages = {}
 
 def clean_text(text):
     text = re.sub(r"\s+", " ", text)  
@@ -31,10 +38,18 @@ def get_internal_links(url):
         print(f"Failed to fetch links from {url}: {e}")
     return links
 
+def save_html(url, html):
+    """Store the raw page so headings/tables/lists survive for chunking"""
+    name = hashlib.sha1(url.encode("utf-8")).hexdigest() + ".html"
+    with open(os.path.join(HTML_DIR, name), "w", encoding="utf-8") as f:
+        f.write(html)
+    pages[name] = url
+
 def scrape_page(url):
     """Scrape text from a single page"""
     try:
         r = requests.get(url, timeout=10)
+        save_html(url, r.text)
         soup = BeautifulSoup(r.text, "lxml")
         page_text = soup.get_text(separator=" ", strip=True)
         return clean_text(page_text)
@@ -71,4 +86,7 @@ with open("data/college.txt", "w", encoding="utf-8") as f:
         f.write(f"URL: {url}\n")
         f.write(content + "\n\n" + "="*100 + "\n\n")
 
-print(f"Done. Scraped {len(data)} pages. Saved to college.txt")
+with open(os.path.join(HTML_DIR, "manifest.json"), "w", encoding="utf-8") as f:
+    json.dump(pages, f, indent=2, ensure_ascii=False)
+
+print(f"Done. Scraped {len(data)} pages. Saved to college.txt and {HTML_DIR}/")